@@ -1,6 +1,12 @@
 import io
+import multiprocessing
+import os
+import queue
 import re
-from typing import Any, Dict, List
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
 import fitz  # PyMuPDF
 import pdfplumber
@@ -8,6 +14,15 @@ import pytesseract
 from PIL import Image
 import platform
 
+try:
+    from tesserocr import OEM, PyTessBaseAPI
+except ImportError:  # e.g. local Windows setups: fall back to the tesseract exe
+    PyTessBaseAPI = None
+
+# Whether OCR goes through tesserocr. Turned off (falling back to the
+# tesseract exe via pytesseract) if its API fails to initialise.
+_use_tesserocr = PyTessBaseAPI is not None
+
 
 # On Windows we must point pytesseract to the installed exe.
 # In Docker/Render (Linux) the system tesseract is picked up automatically.
@@ -16,28 +31,291 @@ if platform.system() == "Windows":
         r"C:\Users\TejusReddy\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
     )
 
+# PyMuPDF does not support being driven from several threads at once (it
+# has one global MuPDF context), and requests run on to_thread workers plus
+# a render thread each. Every MuPDF call in the app goes through this lock;
+# it is held per page, so OCR and pdfplumber work still overlap. Re-entrant
+# so helpers can take it while a caller already holds it.
+MUPDF_LOCK = threading.RLock()
+
+# Zoom used when rendering pages for OCR; Tesseract is told the matching DPI.
+OCR_ZOOM = 2
+
+# Tesseract page segmentation modes; both skip the full layout analysis of
+# the default mode. Pages default to a single text block. Sparse mode is
+# only used for pages with no text layer whose render is nearly blank: less
+# than OCR_SPARSE_INK of the pixels darker than OCR_INK_LEVEL (roughly a
+# couple of hundred characters at OCR_ZOOM). Pages that have native text
+# always use block mode, since sparse mode's extra blank lines would skew
+# the length comparison against that text.
+OCR_PSM_BLOCK = 6  # --psm 6, a single uniform block of text
+OCR_PSM_SPARSE = 11  # --psm 11, sparse text in no particular order
+OCR_INK_LEVEL = 128
+OCR_SPARSE_INK = 0.01
+
+
+def _default_ocr_concurrency() -> int:
+    # sched_getaffinity honours CPU pinning (it is Linux only); cpu_count
+    # reports every host core. Neither sees a container's CPU quota, so keep
+    # the default small: each worker holds its own Tesseract model in memory.
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return max(1, min(cpus, 4))
+
+
+# Number of worker processes used for the OCR fallback. Set OCR_CONCURRENCY=1
+# to OCR pages one by one in the request process.
+OCR_CONCURRENCY = int(os.environ.get("OCR_CONCURRENCY", "0")) or _default_ocr_concurrency()
+
+
+_RE_WS = re.compile(r"[ \t]+")
+_RE_NL = re.compile(r"\n{3,}")
+
 
 def _clean_text(s: str) -> str:
     if not s:
         return ""
     s = s.replace("\r", "\n")
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
+    s = _RE_WS.sub(" ", s)
+    s = _RE_NL.sub("\n\n", s)
     return s.strip()
 
 
-def _ocr_page_image(pix: fitz.Pixmap) -> str:
+# (samples, h, w, psm) of a page rendered for OCR
+_Render = Tuple[bytes, int, int, int]
+
+
+def _render_page(page: fitz.Page, native_text: str) -> _Render:
+    """
+    Renders a page for OCR as 8-bit grayscale and returns its raw samples
+    plus (h, w) and the Tesseract page segmentation mode to use.
+    Only plain bytes + shape are passed to the OCR workers, never the Pixmap,
+    so pickling stays cheap.
+    """
+    mat = fitz.Matrix(OCR_ZOOM, OCR_ZOOM)  # slight zoom helps OCR
+    pix = page.get_pixmap(matrix=mat, alpha=False, colorspace=fitz.csGRAY)
+    samples, h, w = pix.samples, pix.h, pix.w
+
+    psm = OCR_PSM_BLOCK
+    if not native_text:
+        # Ink coverage of the render; histogram() runs in C over the buffer
+        hist = Image.frombuffer("L", (w, h), samples, "raw", "L", 0, 1).histogram()
+        if sum(hist[:OCR_INK_LEVEL]) < OCR_SPARSE_INK * w * h:
+            psm = OCR_PSM_SPARSE
+    return samples, h, w, psm
+
+
+# tesserocr APIs shared by every thread of this process. _ocr_slots caps
+# OCR in this process at OCR_CONCURRENCY calls at a time, so at most that
+# many models are ever loaded here, however many request threads there are.
+_ocr_slots = threading.BoundedSemaphore(OCR_CONCURRENCY)
+_idle_apis: List["PyTessBaseAPI"] = []
+_idle_apis_lock = threading.Lock()
+
+
+def _take_api() -> Optional["PyTessBaseAPI"]:
+    """
+    Returns an idle tesserocr API, creating one if none is free, or None if
+    OCR should go through pytesseract instead: tesserocr is not installed,
+    or its API could not be initialised (typically a wrong tessdata path).
+    Call with an _ocr_slots slot held; give the API back with _release_api.
+    The APIs stay open so the model is loaded once, not once per page.
+    """
+    global _use_tesserocr
+    if not _use_tesserocr:
+        return None
+    with _idle_apis_lock:
+        if _idle_apis:
+            return _idle_apis.pop()
+    try:
+        return PyTessBaseAPI(lang="eng", psm=OCR_PSM_BLOCK, oem=OEM.LSTM_ONLY)
+    except RuntimeError as e:
+        print("WARNING: tesserocr failed to initialise, falling back to pytesseract:", e)
+        _use_tesserocr = False
+        return None
+
+
+def _release_api(api: "PyTessBaseAPI") -> None:
+    with _idle_apis_lock:
+        _idle_apis.append(api)
+
+
+def init_ocr_engine() -> None:
+    """
+    Checks the OCR engine once, at app startup, and logs a warning if it is
+    unusable. tesserocr is probed with a throwaway API and falls back to
+    pytesseract if that fails. Text-layer PDFs are still served without any
+    OCR engine; only pages that need OCR would fail.
+    """
+    global _use_tesserocr
+    if _use_tesserocr:
+        try:
+            with PyTessBaseAPI(lang="eng", psm=OCR_PSM_BLOCK, oem=OEM.LSTM_ONLY):
+                return
+        except RuntimeError as e:
+            print("WARNING: tesserocr failed to initialise, falling back to pytesseract:", e)
+            _use_tesserocr = False
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError as e:
+        print("WARNING: no OCR engine available, scanned pages cannot be OCR'd:", e)
+
+
+def _init_api(use_tesserocr: bool) -> None:
+    """
+    ProcessPoolExecutor initializer: adopt the parent's engine choice and
+    warm up the worker's Tesseract API.
+    """
+    global _use_tesserocr
+    _use_tesserocr = use_tesserocr
+    with _ocr_slots:
+        api = _take_api()
+        if api is not None:
+            _release_api(api)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Returns the process-wide OCR pool, creating it on first use. Workers are
+    started on demand and kept across requests, so each one loads the
+    Tesseract model once. They come from a forkserver (spawn where that is
+    unavailable) rather than a fork of this multi-threaded process.
     """
-    Takes a PyMuPDF pixmap and returns OCR text using PIL + Tesseract.
-    No OpenCV or numpy required.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # One Tesseract thread per worker: the pool already uses the
+            # cores. libgomp reads this when the worker loads tesserocr,
+            # before any initializer runs, so it has to be inherited.
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn"
+            )
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_CONCURRENCY,
+                mp_context=ctx,
+                initializer=_init_api,
+                initargs=(_use_tesserocr,),
+            )
+        return _pool
+
+
+def shutdown_ocr_pool() -> None:
+    """Stops the OCR workers, e.g. on app shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker died: the pool is unusable, let the next request build a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _ocr_bytes(samples: bytes, h: int, w: int, psm: int) -> str:
     """
-    png_bytes = pix.tobytes("png")
-    img = Image.open(io.BytesIO(png_bytes))
-    text = pytesseract.image_to_string(img, lang="eng")
+    Takes raw grayscale pixmap samples and returns OCR text using Tesseract.
+    No OpenCV or numpy required. Runs in the OCR pool workers, and also in
+    the request thread (OCR_CONCURRENCY=1, or a single page to OCR), so it
+    must not rely on worker-only setup such as OMP_THREAD_LIMIT.
+    """
+    with _ocr_slots:
+        api = _take_api()
+        try:
+            if api is None:
+                # frombuffer wraps the samples in place instead of copying them
+                img = Image.frombuffer("L", (w, h), samples, "raw", "L", 0, 1)
+                config = f"--oem 1 --psm {psm} --dpi {72 * OCR_ZOOM}"
+                try:
+                    text = pytesseract.image_to_string(img, lang="eng", config=config)
+                except pytesseract.TesseractNotFoundError as e:
+                    # Its __init__ takes no arguments, so it cannot be unpickled
+                    # in the parent and would break the whole pool.
+                    raise RuntimeError(str(e)) from None
+            else:
+                api.SetPageSegMode(psm)
+                api.SetImageBytes(samples, w, h, 1, w)
+                api.SetSourceResolution(72 * OCR_ZOOM)
+                text = api.GetUTF8Text()
+        finally:
+            if api is not None:
+                _release_api(api)
     return _clean_text(text)
 
 
-def extract_text_and_tables(pdf_bytes: bytes, ocr_threshold_chars: int = 1000) -> Dict[str, Any]:
+def _read_page(
+    doc: fitz.Document, i: int, ocr_threshold_chars: int
+) -> Tuple[str, Optional[_Render]]:
+    """
+    Returns the native text of page i and, if it is too short, a render of
+    the page for OCR. Call with MUPDF_LOCK held: the page is released before
+    this returns, so no MuPDF object outlives the lock.
+    """
+    page = doc[i]
+    # A page with no fonts, annotations or form fields (e.g. a bare scan)
+    # has no text to parse. Filled widgets and FreeText annotations
+    # bring their own appearance fonts, which get_fonts() does not list.
+    has_text = page.get_fonts() or page.first_annot or page.first_widget
+    text = _clean_text(page.get_text("text") or "") if has_text else ""
+
+    # If the text is very short, treat it as scanned and OCR the page image
+    render = _render_page(page, text) if len(text) < ocr_threshold_chars else None
+    return text, render
+
+
+def _produce_pages(
+    doc: fitz.Document, ocr_threshold_chars: int, q: "queue.Queue", stop: threading.Event
+) -> None:
+    """
+    Render thread: puts (index, native_text, render_or_None) for every page
+    on the queue, then None. An exception is put on the queue instead so the
+    consumer can re-raise it.
+    """
+    try:
+        for i in range(len(doc)):
+            if stop.is_set():
+                return
+            with MUPDF_LOCK:
+                text, render = _read_page(doc, i, ocr_threshold_chars)
+            q.put((i, text, render))
+    except BaseException as e:
+        q.put(e)
+        return
+    q.put(None)
+
+
+def _consume_pages(q: "queue.Queue") -> Iterator[Tuple[int, str, Optional[_Render]]]:
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def _longer(text: str, ocr_text: str) -> str:
+    return ocr_text if len(ocr_text) > len(text) else text
+
+
+def extract_text_and_tables(
+    pdf_bytes: bytes,
+    ocr_threshold_chars: int = 1000,
+    doc: Optional[fitz.Document] = None,
+) -> Dict[str, Any]:
     """
     For each page:
       - Get native text from PDF.
@@ -45,6 +323,8 @@ def extract_text_and_tables(pdf_bytes: bytes, ocr_threshold_chars: int = 1000) -
 
     Also extracts tables with pdfplumber (best effort).
 
+    Pass an already opened `doc` to avoid parsing the PDF again with PyMuPDF.
+
     Returns:
       {
         "pages": [
@@ -63,41 +343,114 @@ def extract_text_and_tables(pdf_bytes: bytes, ocr_threshold_chars: int = 1000) -
     result: Dict[str, Any] = {"pages": [], "tables": []}
 
     # -------- TEXT + OCR FALLBACK --------
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    own_doc = doc is None
+    with MUPDF_LOCK:
+        if own_doc:
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        page_count = len(doc)
+
+    # Pages are rendered on a separate thread while earlier pages are being
+    # OCR'd. The queue and the in-flight cap keep at most a few renders alive.
+    max_in_flight = max(1, min(2 * OCR_CONCURRENCY, page_count))
+    q: "queue.Queue" = queue.Queue(maxsize=max_in_flight)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce_pages, args=(doc, ocr_threshold_chars, q, stop), daemon=True
+    )
+    producer.start()
 
-    for i in range(len(doc)):
-        page = doc[i]
-        text = page.get_text("text") or ""
-        text = _clean_text(text)
+    texts: Dict[int, str] = {}
+    native_pages: Set[int] = set()  # page numbers with a non-empty text layer
+    pending: Dict[Future, Tuple[int, str]] = {}
+    executor: Optional[ProcessPoolExecutor] = None
 
-        # If the text is very short, treat it as scanned and OCR the page image
-        if len(text) < ocr_threshold_chars:
-            mat = fitz.Matrix(2, 2)  # slight zoom helps OCR
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-            ocr_text = _ocr_page_image(pix)
-            if len(ocr_text) > len(text):
-                text = ocr_text
+    # The first page needing OCR is held back: if it stays the only one it is
+    # OCR'd right here, without waking a pool worker for a single page.
+    held: Optional[Tuple[int, str, _Render]] = None
 
+    def collect(futures) -> None:
+        for f in futures:
+            i, text = pending.pop(f)
+            texts[i] = _longer(text, f.result())
+
+    def submit(i: int, text: str, render: _Render) -> None:
+        if len(pending) >= max_in_flight:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        pending[executor.submit(_ocr_bytes, *render)] = (i, text)
+
+    try:
+        for i, text, render in _consume_pages(q):
+            if text:
+                native_pages.add(i + 1)
+            if render is None:
+                texts[i] = text
+            elif OCR_CONCURRENCY <= 1:
+                texts[i] = _longer(text, _ocr_bytes(*render))
+            elif executor is None and held is None:
+                held = (i, text, render)
+            else:
+                if executor is None:
+                    # Workers are started on demand, so a document with few
+                    # scanned pages only starts as many as it can keep busy.
+                    executor = _get_pool()
+                    submit(*held)
+                submit(i, text, render)
+        if executor is None and held is not None:
+            i, text, render = held
+            texts[i] = _longer(text, _ocr_bytes(*render))
+        collect(list(pending))
+    except BrokenProcessPool:
+        if executor is not None:
+            _discard_pool(executor)
+        raise
+    finally:
+        # The pool is shared: only drop this call's outstanding work
+        for f in pending:
+            f.cancel()
+        # On error the producer may be blocked on a full queue: unblock it.
+        stop.set()
+        while producer.is_alive():
+            try:
+                q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if own_doc:
+            with MUPDF_LOCK:
+                doc.close()
+
+    for i in range(len(texts)):
         result["pages"].append(
             {
                 "page_no": i + 1,
-                "text": text,
+                "text": texts[i],
             }
         )
 
     # -------- TABLES (best effort) --------
+    # Table cells come from the text layer, so pages without one (scans)
+    # cannot yield a table: don't run pdfplumber's edge detection on them.
+    if not native_pages:
+        return result
+
     with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
         for page_no, p in enumerate(pdf.pages, start=1):
+            if page_no not in native_pages:
+                continue
             try:
                 tables = p.extract_tables()
             except Exception:
                 # if pdfplumber chokes on a page, just skip its tables
                 continue
 
-            for t in tables or []:
+            if not tables:
+                continue
+
+            bbox = p.bbox  # property lookup, hoisted out of the table loop
+            for t in tables:
                 rows: List[List[str]] = []
                 for row in t:
-                    clean_row = [(c or "").strip() for c in row]
+                    clean_row = [c.strip() if c else "" for c in row]
                     if any(clean_row):
                         rows.append(clean_row)
 
@@ -107,7 +460,7 @@ def extract_text_and_tables(pdf_bytes: bytes, ocr_threshold_chars: int = 1000) -
                             "page_no": page_no,
                             "rows": rows,
                             "cols": len(rows[0]) if rows else 0,
-                            "bbox": list(p.bbox),
+                            "bbox": list(bbox),
                         }
                     )
 
@@ -1,13 +1,62 @@
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.responses import JSONResponse
-from typing import Any, Dict
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Tuple
 
-from .extract_all import extract_text_and_tables
+import fitz  # PyMuPDF
+
+from .extract_all import (
+    MUPDF_LOCK,
+    extract_text_and_tables,
+    init_ocr_engine,
+    shutdown_ocr_pool,
+)
 from .signature_check import analyze_signatures
 
+import asyncio
+import hashlib
+import os
 import traceback
 
-app = FastAPI(title="DP PDF Service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_ocr_engine()
+    yield
+    shutdown_ocr_pool()
+
+
+app = FastAPI(title="DP PDF Service", lifespan=lifespan)
+
+# Uploads are read (and hashed) in chunks of this size
+_READ_CHUNK = 1 << 20
+
+# Results are deterministic in (file_hash, ocr_threshold_chars), so repeat
+# uploads of the same PDF are served from a small in-memory LRU cache.
+# RESULT_CACHE_SIZE=0 disables it.
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+# Only (extraction, signatures) are kept; full_text is rebuilt from the
+# pages on a hit so page text is not held twice.
+_result_cache: "OrderedDict[Tuple[str, int], Tuple[Dict[str, Any], Dict[str, Any]]]" = OrderedDict()
+
+
+def _analyze(pdf_bytes: bytes, ocr_threshold_chars: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Parses the PDF once and runs both passes on the same document, one
+    after the other (signatures first, it is a quick widget walk).
+    Concurrent requests run this on several to_thread workers; every MuPDF
+    call, here and in both passes, is serialized through MUPDF_LOCK.
+    """
+    with MUPDF_LOCK:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        signatures = analyze_signatures(pdf_bytes, doc)
+        extraction = extract_text_and_tables(pdf_bytes, ocr_threshold_chars, doc)
+    finally:
+        with MUPDF_LOCK:
+            doc.close()
+    return extraction, signatures
 
 
 @app.get("/health")
@@ -37,20 +86,41 @@ async def analyze_pdf(
                 },
             )
 
-        pdf_bytes = await file.read()
+        # Hash while reading, so the bytes are only walked once
+        hasher = hashlib.sha256()
+        chunks = []
+        while chunk := await file.read(_READ_CHUNK):
+            hasher.update(chunk)
+            chunks.append(chunk)
+        pdf_bytes = b"".join(chunks)
+        file_hash = hasher.hexdigest()
 
-        extraction = extract_text_and_tables(pdf_bytes, ocr_threshold_chars)
-        signatures = analyze_signatures(pdf_bytes)
+        cache_key = (file_hash, ocr_threshold_chars)
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            _result_cache.move_to_end(cache_key)
+            extraction, signatures = cached
+        else:
+            # CPU-bound: run off the event loop so other requests are not blocked
+            extraction, signatures = await asyncio.to_thread(
+                _analyze, pdf_bytes, ocr_threshold_chars
+            )
+
+            if RESULT_CACHE_SIZE > 0:
+                _result_cache[cache_key] = (extraction, signatures)
+                while len(_result_cache) > RESULT_CACHE_SIZE:
+                    _result_cache.popitem(last=False)
 
         # optional: build a flat full_text string for downstream Now Assist skill
-        full_text_parts = [p.get("text", "") for p in extraction.get("pages", [])]
-        full_text = "\n\n".join(t for t in full_text_parts if t)
+        full_text = "\n\n".join(
+            t for p in extraction.get("pages", []) if (t := p.get("text"))
+        )
 
         response: Dict[str, Any] = {
             "status": "ok",
             "file_name": file.filename,
             "file_size_bytes": len(pdf_bytes),
-            "file_hash": None,  # you can add SHA256 if you want
+            "file_hash": file_hash,
             "extraction": extraction,
             "signatures": signatures,
             "full_text": full_text,
@@ -1,16 +1,61 @@
-import io
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from PyPDF2 import PdfReader
+import fitz  # PyMuPDF
 
+from .extract_all import MUPDF_LOCK
 
-def analyze_signatures(pdf_bytes: bytes) -> Dict[str, Any]:
+
+def _sig_string(doc: fitz.Document, xref: int, key: str) -> str:
+    kind, value = doc.xref_get_key(xref, key)
+    return value if kind == "string" else ""
+
+
+def _sig_value_xref(doc: fitz.Document, widget_xref: int) -> int:
     """
-    Very lightweight digital-signature detection using PyPDF2.
+    Returns the xref of the signature dictionary (/V) of a signature
+    widget, looking at its parent field if the widget is a kid. 0 if unsigned.
+    """
+    kind, value = doc.xref_get_key(widget_xref, "V")
+    if kind != "xref":
+        kind, parent = doc.xref_get_key(widget_xref, "Parent")
+        if kind != "xref":
+            return 0
+        kind, value = doc.xref_get_key(int(parent.split()[0]), "V")
+    return int(value.split()[0]) if kind == "xref" else 0
+
+
+def _digital_signatures(doc: fitz.Document) -> List[Dict[str, Any]]:
+    # Called with MUPDF_LOCK held; pages and widgets are released on return
+    digital_sigs: List[Dict[str, Any]] = []
+
+    for page_index, page in enumerate(doc, start=1):
+        for widget in page.widgets(types=[fitz.PDF_WIDGET_TYPE_SIGNATURE]):
+            sig_info = {
+                "page_no": page_index,
+                "field_name": widget.field_name or "",
+            }
+
+            sig_xref = _sig_value_xref(doc, widget.xref)
+            if sig_xref:
+                sig_info["reason"] = _sig_string(doc, sig_xref, "Reason")
+                sig_info["location"] = _sig_string(doc, sig_xref, "Location")
+                sig_info["contact_info"] = _sig_string(doc, sig_xref, "ContactInfo")
+                sig_info["signer"] = _sig_string(doc, sig_xref, "Name")
 
-    We look for annotation fields of type /Sig. This is not a full
+            digital_sigs.append(sig_info)
+
+    return digital_sigs
+
+
+def analyze_signatures(pdf_bytes: bytes, doc: Optional[fitz.Document] = None) -> Dict[str, Any]:
+    """
+    Very lightweight digital-signature detection using PyMuPDF.
+
+    We look for widget fields of type /Sig. This is not a full
     cryptographic validation (that would require heavier libraries),
     but it tells us whether the PDF contains signature fields.
+
+    Pass an already opened `doc` to avoid parsing the PDF again.
     """
     result: Dict[str, Any] = {
         "digital_signatures": [],
@@ -20,46 +65,21 @@ def analyze_signatures(pdf_bytes: bytes) -> Dict[str, Any]:
         },
     }
 
-    try:
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-    except Exception as e:
-        # If PDF is malformed, just return empty signature info
-        result["error"] = f"Failed to parse PDF in signature check: {e}"
-        return result
-
-    digital_sigs: List[Dict[str, Any]] = []
+    own_doc = doc is None
+    with MUPDF_LOCK:
+        try:
+            if own_doc:
+                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        except Exception as e:
+            # If PDF is malformed, just return empty signature info
+            result["error"] = f"Failed to parse PDF in signature check: {e}"
+            return result
 
-    for page_index, page in enumerate(reader.pages, start=1):
-        annots = page.get("/Annots")
-        if not annots:
-            continue
-
-        for annot_ref in annots:
-            try:
-                annot = annot_ref.get_object()
-            except Exception:
-                continue
-
-            subtype = annot.get("/Subtype")
-            field_type = annot.get("/FT")
-
-            # Typical pattern for signature fields
-            if str(subtype) == "/Widget" and str(field_type) == "/Sig":
-                sig_dict = annot.get("/V")
-                sig_info = {
-                    "page_no": page_index,
-                    "field_name": str(annot.get("/T", "")),
-                }
-
-                if sig_dict:
-                    sig_info["reason"] = str(sig_dict.get("/Reason", ""))
-                    sig_info["location"] = str(sig_dict.get("/Location", ""))
-                    sig_info["contact_info"] = str(sig_dict.get("/ContactInfo", ""))
-                    sig_info["signer"] = str(sig_dict.get("/Name", ""))
-
-                digital_sigs.append(sig_info)
-
-    result["digital_signatures"] = digital_sigs
+        try:
+            result["digital_signatures"] = _digital_signatures(doc)
+        finally:
+            if own_doc:
+                doc.close()
 
     # Wet signatures (handwritten) would require image analysis.
     # For now we just return zero.